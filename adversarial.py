@@ -1,6 +1,9 @@
 from __future__ import division
-import sys, pygame, time, numpy, argparse
-pygame.init()
+import sys, time, numpy, argparse
+import patterns
+
+# pygame is only imported once a window is needed, see load_pygame
+pygame = None
 
 # Colors
 GRAY = (100, 100, 100)
@@ -9,15 +12,20 @@ RED = (255, 0, 0)
 
 class ConwaysGameOfLife(object):
     """An adversarial version of Conway's Game of Life."""
+    ORIGIN = 1 # board coordinates of the top left cell
     
-    def __init__(self, size=(12, 12), tile_size=10, updates_per_second=10):
-        """The size must be divisible by tile_width."""
+    def __init__(self, size=(12, 12), tile_size=10, updates_per_second=10, headless=False):
+        """The size must be divisible by tile_width.
+        
+        A headless game never imports pygame and keeps no screen.
+        """
         # Used to access all surrounding cells
         self.differences = ((-1,-1),(-1,0),(-1,1),(0,-1),(0,1),(1,-1),(1,0),(1,1))
         
         self.size = size
         self.tile_size = tile_size
         self.updates_per_second = updates_per_second
+        self.headless = headless
         self.UNCLAIMED = -1
         self.UNCLAIMABLE = -100
         self.teams = [BLUE, RED]
@@ -26,20 +34,27 @@ class ConwaysGameOfLife(object):
             self.team_nums.append(i)
         self.turn = 0
         
-        self.tiles = []
-        for i in range(len(self.teams)):
-            screen = pygame.surface.Surface((tile_size, tile_size))
-            screen.fill(self.teams[i])
-            self.tiles.append(screen)
-        self.screen = pygame.display.set_mode((size[0]*tile_size, size[1]*tile_size))
-        self.screen.fill(GRAY)
-        pygame.display.set_caption("Conway's Game of Life")
-        pygame.display.flip() # show a gray screen
+        if not headless:
+            load_pygame()
+            self.tiles = []
+            for i in range(len(self.teams)):
+                screen = pygame.surface.Surface((tile_size, tile_size))
+                screen.fill(self.teams[i])
+                self.tiles.append(screen)
+            self.screen = pygame.display.set_mode((size[0]*tile_size, size[1]*tile_size))
+            self.screen.fill(GRAY)
+            pygame.display.set_caption("Conway's Game of Life")
+            pygame.display.flip() # show a gray screen
+            from render import ArrayRenderer
+            self.renderer = ArrayRenderer(self.screen, size, tile_size)
         
         self.new_alive_cells = {}
         self.new_dead_cells = set()
         self.alive_cells = {}
         self.health = numpy.zeros((size[0]+2, size[1]+2))# +2 is so we don't have to bounds check later
+        # Team owning each cell, the border ring can never be claimed
+        self.owner = numpy.full((size[0]+2, size[1]+2), self.UNCLAIMABLE, dtype=numpy.int8)
+        self.owner[1:-1, 1:-1] = self.UNCLAIMED
     
     def run(self):
         """Start the main game loop, respond to events as needed."""
@@ -70,107 +85,137 @@ class ConwaysGameOfLife(object):
         """Create cell at click location. Or delete it."""
         i = click[0]//self.tile_size + 1
         j = click[1]//self.tile_size + 1
-        if (i, j) not in self.alive_cells:
-            self.new_alive_cells[(i,j)] = self.turn
-            self.alive_cells[(i,j)] = self.turn
-            self.health[i,j] = 10
+        if self.add_cell(i, j, self.turn):
             self.update_screen()
             self.change_turn()
     
-    def count(self, i, j, team):
-        friends = 0
-        enemies = 0
-        for di,dj in self.differences:
-            if (i+di,j+dj) in self.alive_cells:
-                if self.alive_cells[(i+di,j+dj)] == team:
-                    friends += 1
-                else:
-                    enemies += 1
-        return friends, enemies
+    def add_cell(self, i, j, team):
+        """Give the cell at board coordinates to team, return False if it is already taken."""
+        if (i, j) in self.alive_cells:
+            return False
+        self.new_alive_cells[(i,j)] = team
+        self.alive_cells[(i,j)] = team
+        self.owner[i,j] = team
+        self.health[i,j] = 10
+        return True
+    
+    def randomize(self, density, seed=None):
+        """Fill the board with a random soup, each alive cell goes to a random team."""
+        random = numpy.random.RandomState(seed)
+        soup = random.random_sample(self.size) < density
+        teams = random.randint(0, len(self.teams), self.size)
+        for i, j in zip(*numpy.nonzero(soup)):
+            self.add_cell(int(i) + 1, int(j) + 1, int(teams[i,j]))
     
     def shade(self, i, j, team):
         r,g,b = self.teams[team]
         return (int((r/2) + (r/2)*self.health[i,j]/10), int((g/2) + (g/2)*self.health[i,j]/10), int((b/2) + (b/2)*self.health[i,j]/10))
     
+    def shade_board(self):
+        """Return the color of every cell as a (width, height, 3) array, shade applied to all cells at once."""
+        team = self.owner[1:-1, 1:-1]
+        health = self.health[1:-1, 1:-1, numpy.newaxis]
+        base = numpy.array(self.teams, dtype=float)[team]/2
+        colors = (base + base*health/10).astype(numpy.uint8)
+        colors[team < 0] = GRAY
+        return colors
+    
     def update_screen(self):
         """Update the screen according to the new dead or alive cells."""
-        #~ if len(self.new_dead_cells) + len(self.new_alive_cells) < 200:
-        dirty_rects = []
-        for coords, team in self.alive_cells.items():
-            i,j = coords
-            rect = pygame.Rect((i-1)*self.tile_size, (j-1)*self.tile_size, self.tile_size, self.tile_size)
-            self.screen.fill(self.shade(i,j,team), rect)
-            dirty_rects.append(rect)
         self.new_alive_cells = {}
-        for i,j in self.new_dead_cells:
-            rect = pygame.Rect((i-1)*self.tile_size, (j-1)*self.tile_size, self.tile_size, self.tile_size)
-            self.screen.fill(GRAY, rect)
-            dirty_rects.append(rect)
         self.new_dead_cells = set()
-        pygame.display.update(dirty_rects)
-        #~ else:
-            #~ self.new_alive_cells = []
-            #~ self.new_dead_cells = []
-            #~ self.screen.fill(self.gray)
-            #~ for i,j in self.alive_cells:
-                #~ rect = pygame.Rect((i-1)*self.tile_size, (j-1)*self.tile_size, self.tile_size, self.tile_size)
-                #~ self.screen.blit(self.green_tile, rect)
-            #~ pygame.display.flip()
+        self.renderer.draw(self.shade_board())
     
-    def spawn(self, i, j):
-        counts = {}
-        for di,dj in self.differences:
-            if (i+di,j+dj) in self.alive_cells:
-                counts[self.alive_cells[(i+di,j+dj)]] = counts.setdefault(self.alive_cells[(i+di,j+dj)], 0) + 1
-        if len(counts) == 0:
-            return -1,-1
-        else:
-            m_team = None
-            m_count = 0
-            for team, count in counts.items():
-                if count > m_count:
-                    m_team = team
-                    m_count = count
-            return m_team, m_count
+    def count(self):
+        """Count the alive neighbors of every cell for each team, as a (teams, width, height) array."""
+        width, height = self.owner.shape
+        counts = numpy.zeros((len(self.teams), width, height), dtype=numpy.uint8)
+        for team in self.team_nums:
+            members = (self.owner == team).view(numpy.uint8)
+            inner = counts[team, 1:-1, 1:-1]
+            for di,dj in self.differences:
+                inner += members[1+di:width-1+di, 1+dj:height-1+dj]
+        return counts
     
-    def update(self):
-        """Update each alive cell and any surounding dead cells."""
-        start = time.time()
+    def step(self):
+        """Advance one generation without touching the screen."""
         # determine changes necessary to get to next state
-        relevant_dead_cells = set()
-        for coords, team in self.alive_cells.items():
-            i,j = coords
-            count_friendly, count_enemy = self.count(i,j,team)
-            if count_friendly < 3:
-                self.health[i,j] -= (3 - count_friendly)
-            elif count_friendly > 6:
-                self.health[i,j] -= count_friendly
-            self.health[i,j] -= count_enemy*2
-            if self.health[i,j] <= 0:
-                self.new_dead_cells.add((i, j))
-            for di,dj in self.differences:
-                if (i+di,j+dj) not in self.alive_cells:
-                    relevant_dead_cells.add((i+di,j+dj))
-        for i,j in relevant_dead_cells:
-            if i < 1 or i > self.size[0] or j < 1 or j > self.size[1]:
-                continue
-            team, count = self.spawn(i,j)
-            if count >= 3:
-                self.new_alive_cells[(i,j)] = team
-                self.health[i,j] = 10
+        counts = self.count()
+        alive = self.owner >= 0
+        friends = numpy.zeros(self.owner.shape, dtype=numpy.uint8)
+        for team in self.team_nums:
+            members = self.owner == team
+            friends[members] = counts[team][members]
+        enemies = counts.sum(axis=0) - friends
+        
+        # alive cells lose health from too few or too many friends and from every enemy
+        damage = numpy.where(friends < 3, 3 - friends.astype(int), numpy.where(friends > 6, friends, 0)) + enemies*2
+        self.health[alive] -= damage[alive]
+        died = alive & (self.health <= 0)
         
-        # update counts and volatile cells
-        self.volatile_cells = set()
-        for i,j in self.new_dead_cells:
-            del self.alive_cells[(i,j)]
-        for coords, team in self.new_alive_cells.items():
+        # unclaimed cells go to the team with most neighbors, the lowest team on ties
+        majority = counts.argmax(axis=0)
+        born = (self.owner == self.UNCLAIMED) & (counts.max(axis=0) >= 3)
+        
+        died_i, died_j = numpy.nonzero(died)
+        born_i, born_j = numpy.nonzero(born)
+        born_teams = majority[born]
+        self.owner[died] = self.UNCLAIMED
+        self.owner[born] = born_teams
+        self.health[born] = 10
+        
+        # keep the alive cells in step with the arrays
+        for coords in zip(died_i.tolist(), died_j.tolist()):
+            self.new_dead_cells.add(coords)
+            del self.alive_cells[coords]
+        for coords, team in zip(zip(born_i.tolist(), born_j.tolist()), born_teams.tolist()):
+            self.new_alive_cells[coords] = team
             self.alive_cells[coords] = team
+    
+    def update(self):
+        """Update each alive cell and any surounding dead cells."""
+        if self.headless:
+            # nothing drains the deltas without a screen, keep only this generation's
+            self.new_alive_cells = {}
+            self.new_dead_cells = set()
+            self.step()
+            return
+        start = time.time()
+        self.step()
         
         print 'Update:', time.time() - start
         start = time.time()
         
         self.update_screen()
         print 'Update screen:', time.time() - start
+    
+    def run_headless(self, generations):
+        """Run generations as fast as possible, return the time taken by each one."""
+        timings = []
+        for _ in xrange(generations):
+            start = time.time()
+            self.update()
+            timings.append(time.time() - start)
+        return timings
+
+def load_pygame():
+    """Import and initialize pygame the first time a window is needed."""
+    global pygame
+    if pygame is None:
+        import pygame as module
+        module.init()
+        pygame = module
+    return pygame
+
+def report_headless(game, timings):
+    """Print the final population of each team and the per-generation timing of a headless run."""
+    print 'Generations:', len(timings)
+    print 'Population:', len(game.alive_cells)
+    for team in game.team_nums:
+        print 'Team %d:' % team, sum(1 for t in game.alive_cells.itervalues() if t == team)
+    if timings:
+        print 'Total time:', sum(timings)
+        print 'Generation time (min/mean/max):', min(timings), sum(timings)/len(timings), max(timings)
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Start Conway's Game of Life. The space bar starts iterating, clicking the mouse will create live cells. The right arrow will perform one iteration.")
@@ -178,7 +223,23 @@ if __name__ == "__main__":
     parser.add_argument('-y', type=int, dest='height', action='store', default=12, help='Set the height in tiles of the game board.')
     parser.add_argument('-t', type=int, dest='tile_size', action='store', default=30, help='Set the tile size in pixels (size x size).')
     parser.add_argument('-u', type=int, dest='updates_per_second', action='store', default=10, help='Set the number of updates per second.')
+    parser.add_argument('-g', type=int, dest='generations', action='store', default=None, help='Run this many generations headless, without a window, and report timing.')
+    parser.add_argument('-d', type=float, dest='density', action='store', default=0.0, help='Seed the board with a random soup of this density.')
+    parser.add_argument('-s', type=int, dest='seed', action='store', default=None, help='Set the random seed of the soup.')
+    parser.add_argument('-f', dest='pattern', action='store', default=None, help='Load an RLE or plaintext (.cells) pattern file.')
+    parser.add_argument('-o', dest='output', action='store', default=None, help='Save the final pattern of a headless run, as plaintext for .cells and RLE otherwise.')
     args = parser.parse_args()
     
-    game = ConwaysGameOfLife((args.width, args.height), args.tile_size, args.updates_per_second)
-    game.run()
+    headless = args.generations is not None
+    game = ConwaysGameOfLife((args.width, args.height), args.tile_size, args.updates_per_second, headless)
+    if args.density:
+        game.randomize(args.density, args.seed)
+    if args.pattern:
+        patterns.load_pattern(game, args.pattern, team=0)
+    if headless:
+        report_headless(game, game.run_headless(args.generations))
+        if args.output:
+            patterns.save_pattern(game, args.output)
+    else:
+        game.update_screen()
+        game.run()
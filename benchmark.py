@@ -0,0 +1,137 @@
+import os, time, json, argparse, platform, resource, subprocess, multiprocessing, numpy
+import life, game_of_life, adversarial
+
+# Standard patterns in plaintext form, 'O' is alive
+PATTERNS = {
+    'gun': ['........................O...........',
+            '......................O.O...........',
+            '............OO......OO............OO',
+            '...........O...O....OO............OO',
+            'OO........O.....O...OO..............',
+            'OO........O...O.OO....O.O...........',
+            '..........O.....O.......O...........',
+            '...........O...O....................',
+            '............OO......................'],
+    'rpentomino': ['.OO',
+                   'OO.',
+                   '.O.'],
+    'acorn': ['.O.....',
+              '...O...',
+              'OO..OOO'],
+}
+
+WORKLOADS = ('soup-0.1', 'soup-0.3', 'soup-0.5', 'gun', 'rpentomino', 'acorn')
+ENGINES = ('life-sparse', 'life-numpy', 'life-hashlife', 'life-parallel', 'life-packed', 'game_of_life', 'adversarial')
+
+def make_game(engine, size):
+    """Create a headless game for an engine name."""
+    if engine.startswith('life-'):
+        return life.ConwaysGameOfLife(size, engine=engine[len('life-'):], headless=True)
+    elif engine == 'game_of_life':
+        return game_of_life.ConwaysGameOfLife(size, headless=True)
+    elif engine == 'adversarial':
+        return adversarial.ConwaysGameOfLife(size, headless=True)
+    raise ValueError('Unknown engine: %s' % engine)
+
+def seed(game, workload, size, seed_value):
+    """Seed a game with a workload, patterns are placed in the centre of the board."""
+    if workload.startswith('soup-'):
+        game.randomize(float(workload[len('soup-'):]), seed_value)
+        return
+    rows = PATTERNS[workload]
+    i0 = game.ORIGIN + (size[0] - len(rows[0]))//2
+    j0 = game.ORIGIN + (size[1] - len(rows))//2
+    for dj, row in enumerate(rows):
+        for di, c in enumerate(row):
+            if c == 'O':
+                if isinstance(game, adversarial.ConwaysGameOfLife):
+                    game.add_cell(i0 + di, j0 + dj, 0)
+                else:
+                    game.add_cell(i0 + di, j0 + dj)
+
+def run_case(engine, workload, size, generations, seed_value):
+    """Run one benchmark case in the current process and return its result record."""
+    game = make_game(engine, size)
+    seed(game, workload, size, seed_value)
+    start = time.time()
+    timings = numpy.array(game.run_headless(generations))
+    total = time.time() - start
+    if engine == 'life-parallel':
+        game.parallel.close()
+    p50, p90, p99 = numpy.percentile(timings, [50, 90, 99])
+    return {
+        'engine': engine,
+        'workload': workload,
+        'size': list(size),
+        'generations': generations,
+        'seconds': total,
+        'cells_per_second': size[0]*size[1]*generations/total if total else None,
+        'latency': {'p50': p50, 'p90': p90, 'p99': p99, 'max': timings.max()},
+        'population': len(game.alive_cells),
+        # kilobytes on Linux
+        'peak_memory': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    }
+
+def run_case_in_child(queue, args):
+    try:
+        queue.put(run_case(*args))
+    except Exception as e:
+        queue.put({'error': '%s: %s' % (type(e).__name__, e)})
+
+def run_isolated(engine, workload, size, generations, seed_value):
+    """Run a case in a fresh process so its peak memory is its own."""
+    queue = multiprocessing.Queue()
+    args = (engine, workload, size, generations, seed_value)
+    process = multiprocessing.Process(target=run_case_in_child, args=(queue, args))
+    process.start()
+    result = queue.get()
+    process.join()
+    if 'error' in result:
+        result.update({'engine': engine, 'workload': workload, 'size': list(size), 'generations': generations})
+    return result
+
+def revision():
+    """Return the git revision of the tree being benchmarked, or None."""
+    try:
+        with open(os.devnull, 'w') as devnull:
+            return subprocess.check_output(['git', 'rev-parse', 'HEAD'], stderr=devnull).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run(engines, workloads, sizes, generations, seed_value, output):
+    results = []
+    for size in sizes:
+        for workload in workloads:
+            for engine in engines:
+                result = run_isolated(engine, workload, size, generations, seed_value)
+                results.append(result)
+                if 'error' in result:
+                    print '%-14s %-11s %5dx%-5d error: %s' % (engine, workload, size[0], size[1], result['error'])
+                else:
+                    print '%-14s %-11s %5dx%-5d %12.0f cells/s  p50 %.6fs  p99 %.6fs  %7d KB' % (
+                        engine, workload, size[0], size[1], result['cells_per_second'],
+                        result['latency']['p50'], result['latency']['p99'], result['peak_memory'])
+    report = {
+        'revision': revision(),
+        'time': time.time(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'seed': seed_value,
+        'results': results,
+    }
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+    return report
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the Game of Life engines headless on standard workloads.")
+    parser.add_argument('-e', dest='engines', action='store', default=','.join(ENGINES), help='Comma separated engines, from %s.' % ', '.join(ENGINES))
+    parser.add_argument('-w', dest='workloads', action='store', default=','.join(WORKLOADS), help='Comma separated workloads, from %s.' % ', '.join(WORKLOADS))
+    parser.add_argument('-x', dest='sizes', action='store', default='64,256,1024', help='Comma separated board sizes, boards are square.')
+    parser.add_argument('-g', type=int, dest='generations', action='store', default=100, help='Set the number of generations per run.')
+    parser.add_argument('-s', type=int, dest='seed', action='store', default=0, help='Set the random seed of the soups.')
+    parser.add_argument('-o', dest='output', action='store', default='benchmark.json', help='Set the results file.')
+    args = parser.parse_args()
+    
+    sizes = [(int(s), int(s)) for s in args.sizes.split(',')]
+    run(args.engines.split(','), args.workloads.split(','), sizes, args.generations, args.seed, args.output)
@@ -0,0 +1,130 @@
+import numpy
+
+# One bit per cell: bit b of word w in row i is the cell (i, 64*w + b).
+# Shifts need uint64 operands, numpy would otherwise promote to float.
+ONE = numpy.uint64(1)
+SHIFTS = numpy.arange(64, dtype=numpy.uint64)
+# Set bits of every byte value, to count population a byte at a time
+POPCOUNT = numpy.array([bin(b).count('1') for b in range(256)], dtype=numpy.uint8)
+# Every byte value with its bits reversed, numpy.packbits puts the first cell in the high bit
+REVERSED = numpy.array([int('{0:08b}'.format(b)[::-1], 2) for b in range(256)], dtype=numpy.uint8)
+
+class BitBoard(object):
+    """A set of (i, j) cells stored as packed uint64 words.
+    
+    It supports the set operations the games use on alive_cells (in, add,
+    discard, remove, iteration and len) so it can stand in for the set.
+    The outer ring of shape is a border that is always dead.
+    """
+    
+    def __init__(self, shape):
+        self.shape = shape
+        self.words = numpy.zeros((shape[0], (shape[1] + 63)//64), dtype=numpy.uint64)
+        # cells that may be alive, everything but the border and the padding bits
+        interior = numpy.zeros((shape[0], self.words.shape[1]*64), dtype=bool)
+        interior[1:shape[0]-1, 1:shape[1]-1] = True
+        self.mask = pack(interior)
+    
+    def __contains__(self, cell):
+        i, j = cell
+        return bool((self.words[i, j >> 6] >> numpy.uint64(j & 63)) & ONE)
+    
+    def add(self, cell):
+        i, j = cell
+        self.words[i, j >> 6] |= ONE << numpy.uint64(j & 63)
+    
+    def discard(self, cell):
+        i, j = cell
+        self.words[i, j >> 6] &= ~(ONE << numpy.uint64(j & 63))
+    
+    def remove(self, cell):
+        if cell not in self:
+            raise KeyError(cell)
+        self.discard(cell)
+    
+    def __len__(self):
+        return int(POPCOUNT[self.words.view(numpy.uint8)].sum(dtype=numpy.int64))
+    
+    def __iter__(self):
+        rows, columns = numpy.nonzero(self.words)
+        for start in xrange(0, len(rows), 4096):
+            for cell in unpack(self.words, rows[start:start+4096], columns[start:start+4096]):
+                yield cell
+    
+    def dense(self):
+        """Return the board unpacked to a uint8 array of shape, one byte per cell."""
+        packed = REVERSED[self.words.astype(numpy.dtype('<u8')).view(numpy.uint8)]
+        return numpy.unpackbits(packed, axis=1)[:, :self.shape[1]]
+    
+    def set_block(self, i0, j0, cells):
+        """Make alive every cell that is True in the boolean array cells, placed at (i0, j0)."""
+        rows, width = cells.shape
+        dense = numpy.zeros((rows, self.words.shape[1]*64), dtype=bool)
+        dense[:, j0:j0+width] = cells
+        self.words[i0:i0+rows] |= pack(dense)
+        self.words &= self.mask
+    
+    def step(self):
+        """Advance one generation of B3/S23, return the words that changed as old ^ new."""
+        x = self.words
+        west = numpy.zeros_like(x)
+        west[1:] = x[:-1]
+        east = numpy.zeros_like(x)
+        east[:-1] = x[1:]
+        
+        # a 4 bit count per cell, held as four bit planes
+        planes = [numpy.zeros_like(x) for _ in range(4)]
+        for column in (west, x, east):
+            add_plane(planes, north(column))
+            add_plane(planes, south(column))
+            if column is not x:
+                add_plane(planes, column)
+        s0, s1, s2, s3 = planes
+        
+        # alive next if the count is 3, or 2 and alive now
+        new = ~s3 & ~s2 & s1 & (s0 | x)
+        new &= self.mask
+        changed = x ^ new
+        self.words = new
+        return changed
+    
+    def unpack_changes(self, changed):
+        """Split the changed words returned by step into lists of born and died cells."""
+        return self.unpack_words(changed & self.words), self.unpack_words(changed & ~self.words)
+    
+    def unpack_words(self, words):
+        """Return the (i, j) of every set bit of words, a few thousand words at a time."""
+        rows, columns = numpy.nonzero(words)
+        cells = []
+        for start in xrange(0, len(rows), 4096):
+            cells.extend(unpack(words, rows[start:start+4096], columns[start:start+4096]))
+        return cells
+
+def pack(dense):
+    """Pack a boolean array whose width is a multiple of 64 into uint64 words."""
+    packed = REVERSED[numpy.packbits(dense, axis=1)]
+    return packed.view(numpy.dtype('<u8')).astype(numpy.uint64)
+
+def unpack(words, rows, columns):
+    """Return the (i, j) of the set bits of words at the given rows and columns."""
+    bits = (words[rows, columns][:, None] >> SHIFTS) & ONE
+    k, b = numpy.nonzero(bits)
+    return list(zip(rows[k].tolist(), (columns[k]*64 + b).tolist()))
+
+def north(x):
+    """Shift so that each bit holds its north (j - 1) neighbor."""
+    shifted = x << ONE
+    shifted[:, 1:] |= x[:, :-1] >> numpy.uint64(63)
+    return shifted
+
+def south(x):
+    """Shift so that each bit holds its south (j + 1) neighbor."""
+    shifted = x >> ONE
+    shifted[:, :-1] |= x[:, 1:] << numpy.uint64(63)
+    return shifted
+
+def add_plane(planes, x):
+    """Add the one bit plane x to the multi bit counter planes with a ripple carry."""
+    carry = x
+    for k in range(len(planes)):
+        planes[k], carry = planes[k] ^ carry, planes[k] & carry
@@ -0,0 +1,46 @@
+import numpy
+from collections import deque
+
+class CycleDetector(object):
+    """Notice when a board returns to an earlier state.
+    
+    The board is summarized by a Zobrist hash, the xor of a random 64 bit key
+    for every alive cell. A birth or death toggles one key, so the hash is
+    kept current from the deltas of each generation instead of the whole board.
+    The hashes of the last history generations are remembered.
+    """
+    
+    def __init__(self, shape, history=1024, seed=0):
+        random = numpy.random.RandomState(seed)
+        self.keys = numpy.frombuffer(random.bytes(8*shape[0]*shape[1]), dtype=numpy.uint64).reshape(shape)
+        self.history = history
+        self.hash = 0
+        self.seen = {}
+        self.order = deque()
+    
+    def toggle(self, cells):
+        """Flip the hash for cells, a list of (i, j) that were born or died."""
+        if cells:
+            i, j = numpy.array(cells).T
+            self.hash ^= int(numpy.bitwise_xor.reduce(self.keys[i, j]))
+    
+    def reset(self):
+        """Forget the remembered states, after an edit that is not part of the evolution."""
+        self.seen.clear()
+        self.order.clear()
+    
+    def record(self, generation, born, died):
+        """Apply the deltas of a generation, return its period if the state was seen before, else None."""
+        self.toggle(born)
+        self.toggle(died)
+        previous = self.seen.get(self.hash)
+        self.seen[self.hash] = generation
+        self.order.append((self.hash, generation))
+        if len(self.order) > self.history:
+            old, old_generation = self.order.popleft()
+            # unless the state came back since
+            if self.seen[old] == old_generation:
+                del self.seen[old]
+        if previous is None:
+            return None
+        return generation - previous
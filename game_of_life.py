@@ -1,5 +1,8 @@
-import sys, pygame, time, numpy, argparse
-pygame.init()
+import sys, time, numpy, argparse
+import patterns
+
+# pygame is only imported once a window is needed, see load_pygame
+pygame = None
 
 # There is some bounds checking problem with the board, may occur when adding surrounding dead from a cell
 
@@ -7,28 +10,38 @@ class ConwaysGameOfLife(object):
     """An implementation of Conway's Game of Life."""
     DEAD = 0
     ALIVE = 1
+    ORIGIN = 0 # board coordinates of the top left cell
     
-    def __init__(self, size=(32, 32), tile_size=10, updates_per_second=10):
-        """The size must be square and divisible by tile_width."""
+    def __init__(self, size=(32, 32), tile_size=10, updates_per_second=10, headless=False):
+        """The size must be square and divisible by tile_width.
+        
+        A headless game never imports pygame and keeps no screen.
+        """
         self.green = (0, 255, 0)
         self.gray = (50, 50, 100)
         
         self.size = size
         self.tile_size = tile_size
         self.updates_per_second = updates_per_second
+        self.headless = headless
         
-        self.screen = pygame.display.set_mode((size[0]*tile_size, size[1]*tile_size))
-        self.screen.fill(self.gray)
-        self.green_tile = pygame.surface.Surface((tile_size, tile_size))
-        self.green_tile.fill(self.green)
-        self.gray_tile = pygame.surface.Surface((tile_size, tile_size))
-        self.gray_tile.fill(self.gray)
-        pygame.display.flip()
+        if not headless:
+            load_pygame()
+            self.screen = pygame.display.set_mode((size[0]*tile_size, size[1]*tile_size))
+            self.screen.fill(self.gray)
+            self.green_tile = pygame.surface.Surface((tile_size, tile_size))
+            self.green_tile.fill(self.green)
+            self.gray_tile = pygame.surface.Surface((tile_size, tile_size))
+            self.gray_tile.fill(self.gray)
+            pygame.display.flip()
+            from render import ArrayRenderer, palette
+            self.renderer = ArrayRenderer(self.screen, size, tile_size)
+            self.palette = palette(self.gray, self.green)
         
         self.new_alive_cells = []
         self.new_dead_cells = []
         self.alive_cells = set()
-        self.board = numpy.zeros((size[0]+4, size[1]+4))# +2 is so we don't have to bounds check later
+        self.board = numpy.zeros((size[0]+4, size[1]+4), dtype=numpy.uint8)# +2 is so we don't have to bounds check later
     
     def run(self):
         """Start the main game loop, respond to events as needed."""
@@ -69,10 +82,24 @@ class ConwaysGameOfLife(object):
         """Create cell at click location. Or delete it."""
         i = click[0]//self.tile_size
         j = click[1]//self.tile_size
+        if self.add_cell(i, j):
+            self.update_screen()
+    
+    def add_cell(self, i, j):
+        """Make the cell at board coordinates alive, return False if it already was."""
+        if (i, j) in self.alive_cells:
+            return False
         self.new_alive_cells.append((i,j))
         self.alive_cells.add((i,j))
         self.board[i+1, j+1] = ConwaysGameOfLife.ALIVE
-        self.update_screen()
+        return True
+    
+    def randomize(self, density, seed=None):
+        """Fill the board with a random soup where each cell is alive with probability density."""
+        random = numpy.random.RandomState(seed)
+        soup = random.random_sample(self.size) < density
+        for i, j in zip(*numpy.nonzero(soup)):
+            self.add_cell(int(i), int(j))
     
     def update_screen(self):
         """Update the screen according to the new dead or alive cells."""
@@ -90,18 +117,17 @@ class ConwaysGameOfLife(object):
         #~ self.new_dead_cells = []
         #~ pygame.display.update(dirty_rects)
         
-        # Full refresh is faster
+        # Full refresh is faster, color the whole board in one array lookup
         self.new_alive_cells = []
         self.new_dead_cells = []
-        self.screen.fill(self.gray)
-        for i,j in self.alive_cells:
-            rect = pygame.Rect(i*self.tile_size, j*self.tile_size, self.tile_size, self.tile_size)
-            self.screen.blit(self.green_tile, rect)
-        pygame.display.flip()
+        self.renderer.draw(self.palette[self.visible_board()])
     
-    def update(self):
-        """Update each alive cell and any surounding dead cells."""
-        start = time.time()
+    def visible_board(self):
+        """Return the part of the board on screen, 1 where a cell is alive."""
+        return self.board[1:self.size[0]+1, 1:self.size[1]+1]
+    
+    def step(self):
+        """Advance one generation without touching the screen."""
         # determine changes necessary to get to next state
         self.relevant_dead_cells = set()
         for i,j in self.alive_cells:
@@ -118,6 +144,17 @@ class ConwaysGameOfLife(object):
         for i,j in self.new_alive_cells:
             self.alive_cells.add((i,j))
             self.board[i+1, j+1] = ConwaysGameOfLife.ALIVE
+    
+    def update(self):
+        """Update each alive cell and any surounding dead cells."""
+        if self.headless:
+            # nothing drains the deltas without a screen, keep only this generation's
+            self.new_alive_cells = []
+            self.new_dead_cells = []
+            self.step()
+            return
+        start = time.time()
+        self.step()
         
         print 'Update:', time.time() - start
         start = time.time()
@@ -125,6 +162,15 @@ class ConwaysGameOfLife(object):
         self.update_screen()
         print 'Udate screen:', time.time() - start
     
+    def run_headless(self, generations):
+        """Run generations as fast as possible, return the time taken by each one."""
+        timings = []
+        for _ in xrange(generations):
+            start = time.time()
+            self.update()
+            timings.append(time.time() - start)
+        return timings
+    
     def count_surrounding_alive(self, i, j):
          # count alive neighbors
         i += 1
@@ -161,13 +207,50 @@ class ConwaysGameOfLife(object):
             self.new_dead_cells.append((i-1,j-1))
 
 
+def load_pygame():
+    """Import and initialize pygame the first time a window is needed."""
+    global pygame
+    if pygame is None:
+        import pygame as module
+        module.init()
+        pygame = module
+    return pygame
+
+def report_headless(game, timings):
+    """Print the final population and the per-generation timing of a headless run."""
+    print 'Generations:', len(timings)
+    print 'Population:', len(game.alive_cells)
+    if timings:
+        print 'Total time:', sum(timings)
+        print 'Generation time (min/mean/max):', min(timings), sum(timings)/len(timings), max(timings)
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Start Conway's Game of Life. The space bar starts iterating, clicking the mouse will create live cells.")
     parser.add_argument('-x', type=int, dest='width', action='store', default=64, help='Set the width in tiles of the game board.')
     parser.add_argument('-y', type=int, dest='height', action='store', default=64, help='Set the height in tiles of the game board.')
     parser.add_argument('-t', type=int, dest='tile_size', action='store', default=10, help='Set the tile size in pixels (size x size).')
     parser.add_argument('-u', type=int, dest='updates_per_second', action='store', default=10, help='Set the number of updates per second.')
+    parser.add_argument('-g', type=int, dest='generations', action='store', default=None, help='Run this many generations headless, without a window, and report timing.')
+    parser.add_argument('-d', type=float, dest='density', action='store', default=0.0, help='Seed the board with a random soup of this density.')
+    parser.add_argument('-s', type=int, dest='seed', action='store', default=None, help='Set the random seed of the soup.')
+    parser.add_argument('-a', dest='threaded', action='store_true', default=False, help='Step the simulation in a background thread and draw only its newest state at the display rate.')
+    parser.add_argument('-f', dest='pattern', action='store', default=None, help='Load an RLE or plaintext (.cells) pattern file.')
+    parser.add_argument('-o', dest='output', action='store', default=None, help='Save the final pattern of a headless run, as plaintext for .cells and RLE otherwise.')
     args = parser.parse_args()
     
-    game = ConwaysGameOfLife((args.width, args.height), args.tile_size, args.updates_per_second)
-    game.run()
+    headless = args.generations is not None
+    game = ConwaysGameOfLife((args.width, args.height), args.tile_size, args.updates_per_second, headless)
+    if args.density:
+        game.randomize(args.density, args.seed)
+    if args.pattern:
+        patterns.load_pattern(game, args.pattern)
+    if headless:
+        report_headless(game, game.run_headless(args.generations))
+        if args.output:
+            patterns.save_pattern(game, args.output)
+    elif args.threaded:
+        import runner
+        runner.run_threaded(game)
+    else:
+        game.update_screen()
+        game.run()
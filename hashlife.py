@@ -0,0 +1,226 @@
+from collections import OrderedDict
+
+# Gosper's Hashlife: the plane is a quadtree whose nodes are hash-consed, so
+# identical regions share one node, and the future of each node is memoized.
+
+class Node(object):
+    """An immutable quadtree node covering a 2**level square."""
+    __slots__ = ('level', 'nw', 'ne', 'sw', 'se', 'population')
+    
+    def __init__(self, level, nw, ne, sw, se, population):
+        self.level = level
+        self.nw = nw
+        self.ne = ne
+        self.sw = sw
+        self.se = se
+        self.population = population
+
+class HashLife(object):
+    """An unbounded Life universe stepped with Hashlife.
+    
+    Coordinates are (i, j) pairs like the rest of the games, i grows east and
+    j grows south. max_cache_entries caps the memoized results, the least
+    recently used results are evicted first.
+    """
+    
+    def __init__(self, max_cache_entries=1000000):
+        self.max_cache_entries = max_cache_entries
+        self.nodes = {}
+        self.results = OrderedDict()
+        self.generation = 0
+        self.off = Node(0, None, None, None, None, 0)
+        self.on = Node(0, None, None, None, None, 1)
+        self.empty = [self.off]
+        self.clear()
+    
+    def clear(self):
+        """Remove every cell."""
+        self.root = self.empty_node(3)
+        # (i, j) of the north west corner of root
+        self.origin = (-4, -4)
+    
+    def join(self, nw, ne, sw, se):
+        """Return the canonical node with the given quadrants."""
+        key = (nw, ne, sw, se)
+        node = self.nodes.get(key)
+        if node is None:
+            population = nw.population + ne.population + sw.population + se.population
+            node = Node(nw.level + 1, nw, ne, sw, se, population)
+            self.nodes[key] = node
+        return node
+    
+    def empty_node(self, level):
+        """Return the canonical empty node of a level."""
+        while len(self.empty) <= level:
+            e = self.empty[-1]
+            self.empty.append(self.join(e, e, e, e))
+        return self.empty[level]
+    
+    def expand(self):
+        """Double the root around its centre."""
+        root = self.root
+        e = self.empty_node(root.level - 1)
+        self.root = self.join(self.join(e, e, e, root.nw), self.join(e, e, root.ne, e),
+                              self.join(e, root.sw, e, e), self.join(root.se, e, e, e))
+        half = 1 << (root.level - 1)
+        self.origin = (self.origin[0] - half, self.origin[1] - half)
+    
+    def contains(self, i, j):
+        """Return True if (i, j) is inside the area covered by root."""
+        width = 1 << self.root.level
+        return 0 <= i - self.origin[0] < width and 0 <= j - self.origin[1] < width
+    
+    def is_padded(self):
+        """Return True if every cell of root lies within its centre half."""
+        root = self.root
+        return (root.nw.population == root.nw.se.population and
+                root.ne.population == root.ne.sw.population and
+                root.sw.population == root.sw.ne.population and
+                root.se.population == root.se.nw.population)
+    
+    def set_cell(self, i, j, alive=True):
+        """Set the state of one cell, growing the universe as needed."""
+        while not self.contains(i, j):
+            self.expand()
+        self.root = self._set(self.root, i - self.origin[0], j - self.origin[1], alive)
+    
+    def _set(self, node, i, j, alive):
+        if node.level == 0:
+            return self.on if alive else self.off
+        half = 1 << (node.level - 1)
+        nw, ne, sw, se = node.nw, node.ne, node.sw, node.se
+        if j < half:
+            if i < half:
+                nw = self._set(nw, i, j, alive)
+            else:
+                ne = self._set(ne, i - half, j, alive)
+        else:
+            if i < half:
+                sw = self._set(sw, i, j - half, alive)
+            else:
+                se = self._set(se, i - half, j - half, alive)
+        return self.join(nw, ne, sw, se)
+    
+    def population(self):
+        return self.root.population
+    
+    def cells(self, window=None):
+        """Yield the alive cells, only those inside window=(i0, j0, i1, j1) if given."""
+        stack = [(self.root, self.origin[0], self.origin[1])]
+        while stack:
+            node, i, j = stack.pop()
+            if node.population == 0:
+                continue
+            width = 1 << node.level
+            if window is not None:
+                i0, j0, i1, j1 = window
+                if i + width <= i0 or i >= i1 or j + width <= j0 or j >= j1:
+                    continue
+            if node.level == 0:
+                yield (i, j)
+                continue
+            half = width >> 1
+            stack.append((node.nw, i, j))
+            stack.append((node.ne, i + half, j))
+            stack.append((node.sw, i, j + half))
+            stack.append((node.se, i + half, j + half))
+    
+    def step(self, exponent=0):
+        """Advance the universe 2**exponent generations."""
+        while self.root.level < exponent + 3 or not self.is_padded():
+            self.expand()
+        # one more ring keeps the result clear of the edge
+        self.expand()
+        level = self.root.level
+        self.root = self.successor(self.root, exponent)
+        quarter = 1 << (level - 2)
+        self.origin = (self.origin[0] + quarter, self.origin[1] + quarter)
+        self.generation += 1 << exponent
+        self.collect()
+    
+    def successor(self, node, exponent):
+        """Return the centre of node advanced min(2**exponent, 2**(level-2)) generations."""
+        if node.population == 0:
+            return node.nw
+        exponent = min(exponent, node.level - 2)
+        key = (node, exponent)
+        result = self.results.get(key)
+        if result is not None:
+            # move to the most recently used end
+            del self.results[key]
+            self.results[key] = result
+            return result
+        if node.level == 2:
+            result = self.base_successor(node)
+        else:
+            result = self.advance(node, exponent)
+        self.results[key] = result
+        if len(self.results) > self.max_cache_entries:
+            self.results.popitem(last=False)
+        return result
+    
+    def advance(self, node, exponent):
+        """Compute the successor of a node of level 3 or more from nine overlapping subnodes."""
+        nw, ne, sw, se = node.nw, node.ne, node.sw, node.se
+        join = self.join
+        n00 = self.successor(nw, exponent)
+        n01 = self.successor(join(nw.ne, ne.nw, nw.se, ne.sw), exponent)
+        n02 = self.successor(ne, exponent)
+        n10 = self.successor(join(nw.sw, nw.se, sw.nw, sw.ne), exponent)
+        n11 = self.successor(join(nw.se, ne.sw, sw.ne, se.nw), exponent)
+        n12 = self.successor(join(ne.sw, ne.se, se.nw, se.ne), exponent)
+        n20 = self.successor(sw, exponent)
+        n21 = self.successor(join(sw.ne, se.nw, sw.se, se.sw), exponent)
+        n22 = self.successor(se, exponent)
+        
+        if exponent < node.level - 2:
+            # the nine pieces are already far enough ahead, only take their centres
+            result = join(join(n00.se, n01.sw, n10.ne, n11.nw),
+                          join(n01.se, n02.sw, n11.ne, n12.nw),
+                          join(n10.se, n11.sw, n20.ne, n21.nw),
+                          join(n11.se, n12.sw, n21.ne, n22.nw))
+        else:
+            result = join(self.successor(join(n00, n01, n10, n11), exponent),
+                          self.successor(join(n01, n02, n11, n12), exponent),
+                          self.successor(join(n10, n11, n20, n21), exponent),
+                          self.successor(join(n11, n12, n21, n22), exponent))
+        return result
+    
+    def base_successor(self, node):
+        """Return the centre 2x2 of a 4x4 node after one generation."""
+        grid = [[0]*4 for _ in range(4)]
+        for quadrant, di, dj in ((node.nw, 0, 0), (node.ne, 2, 0), (node.sw, 0, 2), (node.se, 2, 2)):
+            grid[dj][di] = quadrant.nw.population
+            grid[dj][di+1] = quadrant.ne.population
+            grid[dj+1][di] = quadrant.sw.population
+            grid[dj+1][di+1] = quadrant.se.population
+        cells = []
+        for j in (1, 2):
+            for i in (1, 2):
+                count = (grid[j-1][i-1] + grid[j-1][i] + grid[j-1][i+1] + grid[j][i-1] +
+                         grid[j][i+1] + grid[j+1][i-1] + grid[j+1][i] + grid[j+1][i+1])
+                if count == 3 or (count == 2 and grid[j][i]):
+                    cells.append(self.on)
+                else:
+                    cells.append(self.off)
+        return self.join(cells[0], cells[1], cells[2], cells[3])
+    
+    def collect(self):
+        """Drop every node once the node table outgrows the cache cap.
+        
+        The table is rebuilt from root, the memoized results go with it.
+        """
+        if len(self.nodes) <= 2 * self.max_cache_entries:
+            return
+        self.nodes = {}
+        self.results = OrderedDict()
+        self.empty = [self.off]
+        self.root = self._rebuild(self.root)
+    
+    def _rebuild(self, node):
+        if node.level == 0:
+            return node
+        if node.population == 0:
+            return self.empty_node(node.level)
+        return self.join(self._rebuild(node.nw), self._rebuild(node.ne),
+                         self._rebuild(node.sw), self._rebuild(node.se))
@@ -1,5 +1,11 @@
-import sys, pygame, time, numpy, argparse
-pygame.init()
+import sys, time, numpy, argparse
+import patterns
+from hashlife import HashLife
+from bitboard import BitBoard
+from cycles import CycleDetector
+
+# pygame is only imported once a window is needed, see load_pygame
+pygame = None
 
 # Use time to make updates less than desired to keep interactivity.
 
@@ -7,9 +13,26 @@ class ConwaysGameOfLife(object):
     """An implementation of Conway's Game of Life."""
     DEAD = 0
     ALIVE = 1
+    ORIGIN = 1 # board coordinates of the top left cell
+    ENGINES = ('sparse', 'numpy', 'hashlife', 'parallel', 'packed', 'chunked')
+    CHUNK_SIZE = 16
     
-    def __init__(self, size=(32, 32), tile_size=10, updates_per_second=10):
-        """The size must be divisible by tile_width."""
+    def __init__(self, size=(32, 32), tile_size=10, updates_per_second=10, engine='sparse', headless=False, step_exponent=0, processes=None):
+        """The size must be divisible by tile_width.
+        
+        The engine is one of ENGINES: 'sparse' walks the alive cells in Python,
+        'numpy' steps the whole board with array operations, 'hashlife'
+        advances an unbounded plane 2**step_exponent generations per update,
+        of which only the size window is shown, 'parallel' steps tiles of
+        the board on a pool of processes (all cores unless processes is given),
+        'packed' keeps one bit per cell and 'chunked' only evaluates the
+        CHUNK_SIZE square chunks next to a change, replaying period 2 chunks.
+        The parallel engine keeps board in shared memory and does not maintain counts.
+        The packed engine has neither counts nor board, alive_cells is a BitBoard.
+        A headless game never imports pygame and keeps no screen.
+        """
+        if engine not in ConwaysGameOfLife.ENGINES:
+            raise ValueError('Unknown engine: %s' % engine)
         self.green = (0, 255, 0)
         self.gray = (50, 50, 50)
         # Used to access all surrounding cells
@@ -18,26 +41,60 @@ class ConwaysGameOfLife(object):
         self.size = size
         self.tile_size = tile_size
         self.updates_per_second = updates_per_second
+        self.engine = engine
+        self.headless = headless
+        # only the packed engine can skip filling new_alive_cells and new_dead_cells
+        self.record_changes = not headless
+        self.generation = 0
+        # see detect_cycles
+        self.cycles = None
+        self.period = None
+        self.cycle_start = None
+        self.step_exponent = step_exponent
+        if engine == 'hashlife':
+            self.universe = HashLife()
+        if engine == 'chunked':
+            # chunks that changed in the last generation, or were edited
+            self.changed_chunks = set()
+            # chunk -> (its last delta, the delta before), deltas are (born, died) lists, None after an edit
+            self.chunk_history = {}
         
-        self.screen = pygame.display.set_mode((size[0]*tile_size, size[1]*tile_size))
-        self.screen.fill(self.gray)
-        self.green_tile = pygame.surface.Surface((tile_size, tile_size))
-        self.green_tile.fill(self.green)
-        self.gray_tile = pygame.surface.Surface((tile_size, tile_size))
-        self.gray_tile.fill(self.gray)
-        pygame.display.set_caption("Conway's Game of Life")
-        pygame.display.flip() # show a gray screen
+        if not headless:
+            load_pygame()
+            self.screen = pygame.display.set_mode((size[0]*tile_size, size[1]*tile_size))
+            self.screen.fill(self.gray)
+            self.green_tile = pygame.surface.Surface((tile_size, tile_size))
+            self.green_tile.fill(self.green)
+            self.gray_tile = pygame.surface.Surface((tile_size, tile_size))
+            self.gray_tile.fill(self.gray)
+            pygame.display.set_caption("Conway's Game of Life")
+            pygame.display.flip() # show a gray screen
+            from render import ArrayRenderer, palette
+            self.renderer = ArrayRenderer(self.screen, size, tile_size)
+            self.palette = palette(self.gray, self.green)
         
         self.new_alive_cells = []
         self.new_dead_cells = []
+        if engine == 'packed':
+            self.alive_cells = BitBoard((size[0]+2, size[1]+2))
+            self.counts = None
+            self.board = None
+            return
         self.alive_cells = set()
-        self.counts = numpy.zeros((size[0]+2, size[1]+2))# +2 is so we don't have to bounds check later
+        self.counts = numpy.zeros((size[0]+2, size[1]+2), dtype=numpy.int8)# +2 is so we don't have to bounds check later
         for i in xrange(0, size[0]+2):
             self.counts[i,0] = -100
             self.counts[i,size[1]+1] = -100
         for j in xrange(0, size[1]+2):
             self.counts[0,j] = -100
             self.counts[size[0]+1, j] = -100
+        # Dense copy of alive_cells, the border ring is never alive
+        if engine == 'parallel':
+            from parallel import ParallelLife
+            self.parallel = ParallelLife((size[0]+2, size[1]+2), processes)
+            self.board = self.parallel.board
+        else:
+            self.board = numpy.zeros((size[0]+2, size[1]+2), dtype=numpy.uint8)
     
     def run(self):
         """Start the main game loop, respond to events as needed."""
@@ -80,12 +137,45 @@ class ConwaysGameOfLife(object):
         """Create cell at click location. Or delete it."""
         i = click[0]//self.tile_size + 1
         j = click[1]//self.tile_size + 1
-        if (i, j) not in self.alive_cells:
-            self.new_alive_cells.append((i,j))
-            self.alive_cells.add((i,j))
-            self.increment_counts(i, j)
+        if self.add_cell(i, j):
             self.update_screen()
     
+    def add_cell(self, i, j):
+        """Make the cell at board coordinates alive, return False if it already was."""
+        if (i, j) in self.alive_cells:
+            return False
+        self.new_alive_cells.append((i,j))
+        self.alive_cells.add((i,j))
+        if self.cycles is not None:
+            self.cycles.toggle([(i, j)])
+            self.cycles.reset()
+        if self.engine == 'packed':
+            return True
+        self.board[i,j] = ConwaysGameOfLife.ALIVE
+        self.increment_counts(i, j)
+        if self.engine == 'hashlife':
+            self.universe.set_cell(i, j)
+        elif self.engine == 'chunked':
+            chunk = ((i-1)//self.CHUNK_SIZE, (j-1)//self.CHUNK_SIZE)
+            self.changed_chunks.add(chunk)
+            self.chunk_history[chunk] = (None, None)
+        return True
+    
+    def randomize(self, density, seed=None):
+        """Fill the board with a random soup where each cell is alive with probability density."""
+        random = numpy.random.RandomState(seed)
+        if self.engine == 'packed':
+            # draw the same soup a block of rows at a time so it is never held unpacked
+            for i in xrange(0, self.size[0], 64):
+                rows = random.random_sample((min(64, self.size[0] - i), self.size[1])) < density
+                self.alive_cells.set_block(i + 1, 1, rows)
+            if not self.headless:
+                self.new_alive_cells.extend(self.alive_cells)
+            return
+        soup = random.random_sample(self.size) < density
+        for i, j in zip(*numpy.nonzero(soup)):
+            self.add_cell(int(i) + 1, int(j) + 1)
+    
     def increment_counts(self, i, j):
         for di,dj in self.differences:
             self.counts[i+di, j+dj] += 1
@@ -118,18 +208,19 @@ class ConwaysGameOfLife(object):
             self.new_dead_cells = []
             pygame.display.update(dirty_rects)
         else:
+            # too many changes for dirty rectangles, color the whole board in one array lookup
             self.new_alive_cells = []
             self.new_dead_cells = []
-            self.screen.fill(self.gray)
-            for i,j in self.alive_cells:
-                rect = pygame.Rect((i-1)*self.tile_size, (j-1)*self.tile_size, self.tile_size, self.tile_size)
-                self.screen.blit(self.green_tile, rect)
-            pygame.display.flip()
+            self.renderer.draw(self.palette[self.visible_board()])
     
-    def update(self):
-        """Update each alive cell and any surounding dead cells."""
-        start = time.time()
-        # determine changes necessary to get to next state
+    def visible_board(self):
+        """Return the board without its border, 1 where a cell is alive."""
+        if self.engine == 'packed':
+            return self.alive_cells.dense()[1:-1, 1:-1]
+        return self.board[1:-1, 1:-1]
+    
+    def step_sparse(self):
+        """Determine the changes to the next state from the alive cells and their neighbors."""
         relevant_dead_cells = set()
         for i,j in self.alive_cells:
             if self.counts[i,j] < 2 or self.counts[i,j] > 3:
@@ -145,16 +236,236 @@ class ConwaysGameOfLife(object):
         self.volatile_cells = set()
         for i,j in self.new_dead_cells:
             self.alive_cells.remove((i,j))
+            self.board[i,j] = ConwaysGameOfLife.DEAD
             self.decrement_counts(i, j)
         for i,j in self.new_alive_cells:
             self.alive_cells.add((i,j))
+            self.board[i,j] = ConwaysGameOfLife.ALIVE
             self.increment_counts(i, j)
+    
+    def step_numpy(self):
+        """Determine the changes to the next state with whole board array operations."""
+        # the counts are kept current by create_cell and the end of each step
+        neighbors = self.counts[1:-1, 1:-1]
+        alive = self.board[1:-1, 1:-1] == ConwaysGameOfLife.ALIVE
+        born = ~alive & (neighbors == 3)
+        died = alive & ((neighbors < 2) | (neighbors > 3))
+        
+        # indices are offset by one because of the border ring
+        born_i, born_j = numpy.nonzero(born)
+        died_i, died_j = numpy.nonzero(died)
+        new_alive_cells = list(zip((born_i + 1).tolist(), (born_j + 1).tolist()))
+        new_dead_cells = list(zip((died_i + 1).tolist(), (died_j + 1).tolist()))
+        self.new_alive_cells.extend(new_alive_cells)
+        self.new_dead_cells.extend(new_dead_cells)
+        
+        # update the board, the alive set and the counts, keeping the -100 sentinel border
+        self.board[1:-1, 1:-1][born] = ConwaysGameOfLife.ALIVE
+        self.board[1:-1, 1:-1][died] = ConwaysGameOfLife.DEAD
+        self.alive_cells.difference_update(new_dead_cells)
+        self.alive_cells.update(new_alive_cells)
+        self.counts[1:-1, 1:-1] = count_neighbors(self.board)[1:-1, 1:-1]
+    
+    def step_hashlife(self):
+        """Jump the universe ahead and project the visible window back onto the board."""
+        self.universe.step(self.step_exponent)
+        visible = set(self.universe.cells((1, 1, self.size[0]+1, self.size[1]+1)))
+        self.new_alive_cells.extend(visible - self.alive_cells)
+        self.new_dead_cells.extend(self.alive_cells - visible)
+        for i,j in self.new_dead_cells:
+            self.board[i,j] = ConwaysGameOfLife.DEAD
+            self.decrement_counts(i, j)
+        for i,j in self.new_alive_cells:
+            self.board[i,j] = ConwaysGameOfLife.ALIVE
+            self.increment_counts(i, j)
+        self.alive_cells = visible
+    
+    def step_parallel(self):
+        """Step the shared board on the process pool and collect the changes of every tile."""
+        born_i, born_j, died_i, died_j = self.parallel.step()
+        self.board = self.parallel.board
+        new_alive_cells = list(zip(born_i.tolist(), born_j.tolist()))
+        new_dead_cells = list(zip(died_i.tolist(), died_j.tolist()))
+        self.new_alive_cells.extend(new_alive_cells)
+        self.new_dead_cells.extend(new_dead_cells)
+        self.alive_cells.difference_update(new_dead_cells)
+        self.alive_cells.update(new_alive_cells)
+    
+    def step_packed(self):
+        """Step the packed words with bitwise adders and unpack only the words that changed."""
+        changed = self.alive_cells.step()
+        # listing every change of a huge board costs more than the step, skip it when nothing reads them
+        if self.record_changes:
+            born, died = self.alive_cells.unpack_changes(changed)
+            self.new_alive_cells.extend(born)
+            self.new_dead_cells.extend(died)
+    
+    def chunk_neighbors(self, chunk):
+        """Return the chunk and the chunks around it that are on the board."""
+        ci, cj = chunk
+        last_i = (self.size[0]-1)//self.CHUNK_SIZE
+        last_j = (self.size[1]-1)//self.CHUNK_SIZE
+        return [(ci+di, cj+dj) for di in (-1, 0, 1) for dj in (-1, 0, 1)
+                if 0 <= ci+di <= last_i and 0 <= cj+dj <= last_j]
+    
+    def chunk_is_period_2(self, chunk):
+        """Return True if the chunk is back in the state it had two generations ago."""
+        history = self.chunk_history.get(chunk)
+        if history is None:
+            return True
+        last, before = history
+        if last is None or before is None:
+            return False
+        return last[0] == before[1] and last[1] == before[0]
+    
+    def step_chunked(self):
+        """Evaluate only the chunks next to a change, replay the ones whose whole neighborhood has period 2.
+        
+        A chunk whose neighborhood did not change last generation cannot
+        change, and one whose neighborhood is back in the state of two
+        generations ago will repeat the delta it had the generation before.
+        """
+        size = self.CHUNK_SIZE
+        candidates = set()
+        for chunk in self.changed_chunks:
+            candidates.update(self.chunk_neighbors(chunk))
+        
+        history = {}
+        born_cells = []
+        died_cells = []
+        for chunk in candidates:
+            last = self.chunk_history.get(chunk, (None, None))[0]
+            if last is not None and all(self.chunk_is_period_2(n) for n in self.chunk_neighbors(chunk)):
+                born, died = self.chunk_history[chunk][1]
+            else:
+                i0 = 1 + chunk[0]*size
+                j0 = 1 + chunk[1]*size
+                i1 = min(i0 + size, self.size[0] + 1)
+                j1 = min(j0 + size, self.size[1] + 1)
+                alive = self.board[i0:i1, j0:j1] == ConwaysGameOfLife.ALIVE
+                counts = self.counts[i0:i1, j0:j1]
+                born_i, born_j = numpy.nonzero(~alive & (counts == 3))
+                died_i, died_j = numpy.nonzero(alive & ((counts < 2) | (counts > 3)))
+                born = list(zip((born_i + i0).tolist(), (born_j + j0).tolist()))
+                died = list(zip((died_i + i0).tolist(), (died_j + j0).tolist()))
+            # chunks missing from the history have been still for two generations
+            if born or died or last is None or last[0] or last[1]:
+                history[chunk] = ((born, died), last)
+            born_cells.extend(born)
+            died_cells.extend(died)
+        self.chunk_history = history
+        self.changed_chunks = set(chunk for chunk, (last, _) in history.items() if last[0] or last[1])
+        
+        self.new_alive_cells.extend(born_cells)
+        self.new_dead_cells.extend(died_cells)
+        for i,j in died_cells:
+            self.board[i,j] = ConwaysGameOfLife.DEAD
+            self.decrement_counts(i, j)
+        for i,j in born_cells:
+            self.board[i,j] = ConwaysGameOfLife.ALIVE
+            self.increment_counts(i, j)
+        self.alive_cells.difference_update(died_cells)
+        self.alive_cells.update(born_cells)
+    
+    def detect_cycles(self, history=1024):
+        """Hash the board after every step so that period holds the period once a state repeats."""
+        self.cycles = CycleDetector((self.size[0]+2, self.size[1]+2), history)
+        self.cycles.toggle(list(self.alive_cells))
+        self.cycles.record(self.generation, [], [])
+        self.record_changes = True
+    
+    def step(self):
+        """Advance one generation, or 2**step_exponent with hashlife, without touching the screen."""
+        born_start = len(self.new_alive_cells)
+        died_start = len(self.new_dead_cells)
+        if self.engine == 'numpy':
+            self.step_numpy()
+        elif self.engine == 'hashlife':
+            self.step_hashlife()
+        elif self.engine == 'parallel':
+            self.step_parallel()
+        elif self.engine == 'packed':
+            self.step_packed()
+        elif self.engine == 'chunked':
+            self.step_chunked()
+        else:
+            self.step_sparse()
+        self.generation += 1 << self.step_exponent if self.engine == 'hashlife' else 1
+        if self.cycles is not None:
+            self.period = self.cycles.record(self.generation, self.new_alive_cells[born_start:], self.new_dead_cells[died_start:])
+    
+    def update(self):
+        """Update each alive cell and any surounding dead cells."""
+        if self.headless:
+            # nothing drains the deltas without a screen, keep only this generation's
+            self.new_alive_cells = []
+            self.new_dead_cells = []
+            self.step()
+            return
+        start = time.time()
+        # determine changes necessary to get to next state
+        self.step()
         
         print 'Update:', time.time() - start
         start = time.time()
         
         self.update_screen()
         print 'Update screen:', time.time() - start
+    
+    def run_headless(self, generations):
+        """Run generations as fast as possible, return the time taken by each one.
+        
+        With detect_cycles, the run ends as soon as the board repeats: a still
+        life stops there and an oscillator only steps the remainder of its
+        period, so the final board is the one the full run would have left.
+        """
+        timings = []
+        updates = 0
+        while updates < generations:
+            start = time.time()
+            self.update()
+            timings.append(time.time() - start)
+            updates += 1
+            if self.period is not None:
+                self.cycle_start = self.generation - self.period
+                stride = 1 << self.step_exponent if self.engine == 'hashlife' else 1
+                for _ in xrange((generations - updates) % (self.period // stride)):
+                    self.update()
+                break
+        return timings
+
+def load_pygame():
+    """Import and initialize pygame the first time a window is needed."""
+    global pygame
+    if pygame is None:
+        import pygame as module
+        module.init()
+        pygame = module
+    return pygame
+
+def report_headless(game, timings):
+    """Print the final population and the per-generation timing of a headless run."""
+    print 'Generations:', len(timings)
+    print 'Population:', len(game.alive_cells)
+    if game.period is not None:
+        print 'Cycle: period %d from generation %d' % (game.period, game.cycle_start)
+    if timings:
+        print 'Total time:', sum(timings)
+        print 'Generation time (min/mean/max):', min(timings), sum(timings)/len(timings), max(timings)
+
+def count_neighbors(board):
+    """Count the alive neighbors of every cell by summing shifted copies of the board.
+    
+    The outer ring of the result is left at zero so the board may carry a border.
+    """
+    width, height = board.shape
+    counts = numpy.zeros(board.shape, dtype=numpy.uint8)
+    inner = counts[1:-1, 1:-1]
+    for di in (-1, 0, 1):
+        for dj in (-1, 0, 1):
+            if di or dj:
+                inner += board[1+di:width-1+di, 1+dj:height-1+dj]
+    return counts
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Start Conway's Game of Life. The space bar starts iterating, clicking the mouse will create live cells. The right arrow will perform one iteration.")
@@ -162,7 +473,33 @@ if __name__ == "__main__":
     parser.add_argument('-y', type=int, dest='height', action='store', default=64, help='Set the height in tiles of the game board.')
     parser.add_argument('-t', type=int, dest='tile_size', action='store', default=10, help='Set the tile size in pixels (size x size).')
     parser.add_argument('-u', type=int, dest='updates_per_second', action='store', default=10, help='Set the number of updates per second.')
+    parser.add_argument('-e', dest='engine', action='store', default='sparse', choices=ConwaysGameOfLife.ENGINES, help='Set the engine used to compute each generation.')
+    parser.add_argument('-k', type=int, dest='step_exponent', action='store', default=0, help='With the hashlife engine, advance 2**k generations per update.')
+    parser.add_argument('-p', type=int, dest='processes', action='store', default=None, help='With the parallel engine, set the number of processes (all cores by default).')
+    parser.add_argument('-g', type=int, dest='generations', action='store', default=None, help='Run this many generations headless, without a window, and report timing.')
+    parser.add_argument('-d', type=float, dest='density', action='store', default=0.0, help='Seed the board with a random soup of this density.')
+    parser.add_argument('-s', type=int, dest='seed', action='store', default=None, help='Set the random seed of the soup.')
+    parser.add_argument('-c', dest='cycles', action='store_true', default=False, help='In a headless run, stop early once the board repeats and report the period.')
+    parser.add_argument('-a', dest='threaded', action='store_true', default=False, help='Step the simulation in a background thread and draw only its newest state at the display rate.')
+    parser.add_argument('-f', dest='pattern', action='store', default=None, help='Load an RLE or plaintext (.cells) pattern file.')
+    parser.add_argument('-o', dest='output', action='store', default=None, help='Save the final pattern of a headless run, as plaintext for .cells and RLE otherwise.')
     args = parser.parse_args()
     
-    game = ConwaysGameOfLife((args.width, args.height), args.tile_size, args.updates_per_second)
-    game.run()
+    headless = args.generations is not None
+    game = ConwaysGameOfLife((args.width, args.height), args.tile_size, args.updates_per_second, args.engine, headless, args.step_exponent, args.processes)
+    if args.density:
+        game.randomize(args.density, args.seed)
+    if args.pattern:
+        patterns.load_pattern(game, args.pattern)
+    if headless:
+        if args.cycles:
+            game.detect_cycles()
+        report_headless(game, game.run_headless(args.generations))
+        if args.output:
+            patterns.save_pattern(game, args.output)
+    elif args.threaded:
+        import runner
+        runner.run_threaded(game)
+    else:
+        game.update_screen()
+        game.run()
@@ -0,0 +1,71 @@
+import multiprocessing, numpy
+from multiprocessing.sharedctypes import RawArray
+from life import count_neighbors
+
+# The board lives in two shared memory buffers, one holding the current
+# generation and one receiving the next. Each worker steps one tile, reading
+# the one-cell halo around it straight out of the current buffer, so halos are
+# exchanged by the pool barrier between generations and nothing is pickled
+# but the tile bounds and the births and deaths.
+
+# numpy views of the shared buffers inside a worker, set by init_worker
+boards = None
+
+def init_worker(buffers, shape):
+    global boards
+    boards = [numpy.frombuffer(buffer, dtype=numpy.uint8).reshape(shape) for buffer in buffers]
+
+def step_tile(args):
+    """Step the tile [i0:i1, j0:j1] from boards[current] into the other board.
+    
+    Return the births and deaths as arrays of board coordinates.
+    """
+    current, i0, i1, j0, j1 = args
+    board = boards[current]
+    window = board[i0-1:i1+1, j0-1:j1+1]
+    neighbors = count_neighbors(window)[1:-1, 1:-1]
+    alive = window[1:-1, 1:-1] == 1
+    born = ~alive & (neighbors == 3)
+    died = alive & ((neighbors < 2) | (neighbors > 3))
+    boards[1 - current][i0:i1, j0:j1] = born | (alive & ~died)
+    born_i, born_j = numpy.nonzero(born)
+    died_i, died_j = numpy.nonzero(died)
+    return born_i + i0, born_j + j0, died_i + i0, died_j + j0
+
+class ParallelLife(object):
+    """Step a board with a one-cell dead border on a pool of processes.
+    
+    shape includes the border. board is a numpy view of the current
+    generation in shared memory, write cells into it directly.
+    """
+    
+    def __init__(self, shape, processes=None, tile_cells=512):
+        self.shape = shape
+        size = shape[0] * shape[1]
+        self.buffers = [RawArray('B', size), RawArray('B', size)]
+        self.boards = [numpy.frombuffer(buffer, dtype=numpy.uint8).reshape(shape) for buffer in self.buffers]
+        self.current = 0
+        self.tiles = []
+        for i0 in xrange(1, shape[0]-1, tile_cells):
+            for j0 in xrange(1, shape[1]-1, tile_cells):
+                self.tiles.append((i0, min(i0 + tile_cells, shape[0]-1), j0, min(j0 + tile_cells, shape[1]-1)))
+        self.pool = multiprocessing.Pool(processes, init_worker, (self.buffers, shape))
+    
+    @property
+    def board(self):
+        return self.boards[self.current]
+    
+    def step(self):
+        """Advance one generation, return the births and deaths as (i, j) arrays."""
+        work = [(self.current,) + tile for tile in self.tiles]
+        results = self.pool.map(step_tile, work)
+        self.current = 1 - self.current
+        born_i = numpy.concatenate([r[0] for r in results])
+        born_j = numpy.concatenate([r[1] for r in results])
+        died_i = numpy.concatenate([r[2] for r in results])
+        died_j = numpy.concatenate([r[3] for r in results])
+        return born_i, born_j, died_i, died_j
+    
+    def close(self):
+        self.pool.close()
+        self.pool.join()
@@ -0,0 +1,173 @@
+import os, re
+
+# Readers yield runs of alive cells as (i, j, length) so that a pattern is
+# never held in memory as a whole, i grows east (the RLE x) and j south.
+
+CHUNK_SIZE = 1 << 16
+HEADER = re.compile(r'x\s*=\s*(\d+)\s*,\s*y\s*=\s*(\d+)(?:\s*,\s*rule\s*=\s*(\S+))?')
+
+def read_rle(f):
+    """Yield the runs of alive cells of a run length encoded pattern file."""
+    # comments and the header come first, one per line
+    header = None
+    while header is None:
+        line = f.readline()
+        if not line:
+            return
+        line = line.strip()
+        if line and not line.startswith('#'):
+            header = HEADER.match(line)
+            if header is None:
+                raise ValueError('RLE header expected, got: %s' % line)
+    
+    i = j = 0
+    count = ''
+    while True:
+        chunk = f.read(CHUNK_SIZE)
+        if not chunk:
+            return
+        for c in chunk:
+            if c.isdigit():
+                count += c
+                continue
+            if c.isspace():
+                continue
+            n = int(count) if count else 1
+            count = ''
+            if c == 'b' or c == '.':
+                i += n
+            elif c == '$':
+                i = 0
+                j += n
+            elif c == '!':
+                return
+            else:
+                # o, or any state of a multi-state pattern, is alive
+                yield (i, j, n)
+                i += n
+
+def read_plaintext(f):
+    """Yield the runs of alive cells of a plaintext (.cells) pattern file."""
+    j = 0
+    for line in f:
+        if line.startswith('!'):
+            continue
+        line = line.rstrip('\r\n')
+        i = 0
+        while i < len(line):
+            if line[i] == '.':
+                i += 1
+                continue
+            start = i
+            while i < len(line) and line[i] != '.':
+                i += 1
+            yield (start, j, i - start)
+        j += 1
+
+def read_pattern(path):
+    """Yield the runs of a pattern file, the format is chosen by extension."""
+    reader = read_plaintext if os.path.splitext(path)[1].lower() in ('.cells', '.txt') else read_rle
+    with open(path) as f:
+        for run in reader(f):
+            yield run
+
+def load_pattern(game, path, offset=(0, 0), team=None):
+    """Add the cells of a pattern file to a game, shifted by offset.
+    
+    Cells are added through game.add_cell so they land in alive_cells and the
+    counts or board arrays of the game. Cells off the board are dropped.
+    The team is passed along for adversarial games. Return the number of cells added.
+    """
+    width, height = game.size
+    added = 0
+    for i, j, length in read_pattern(path):
+        j += offset[1]
+        if not 0 <= j < height:
+            continue
+        for i in xrange(max(i + offset[0], 0), min(i + offset[0] + length, width)):
+            if team is None:
+                added += game.add_cell(i + game.ORIGIN, j + game.ORIGIN)
+            else:
+                added += game.add_cell(i + game.ORIGIN, j + game.ORIGIN, team)
+    return added
+
+def bounding_box(cells):
+    """Return (i0, j0, i1, j1) around cells in one pass, i1 and j1 exclusive."""
+    i0 = j0 = i1 = j1 = None
+    for i, j in cells:
+        if i0 is None:
+            i0 = i1 = i
+            j0 = j1 = j
+            continue
+        if i < i0:
+            i0 = i
+        elif i > i1:
+            i1 = i
+        if j < j0:
+            j0 = j
+        elif j > j1:
+            j1 = j
+    if i0 is None:
+        return (0, 0, 0, 0)
+    return (i0, j0, i1 + 1, j1 + 1)
+
+def row_runs(cells, j, i0, i1):
+    """Yield (alive, length) runs of row j between i0 and i1 by membership tests on cells."""
+    i = i0
+    while i < i1:
+        alive = (i, j) in cells
+        start = i
+        while i < i1 and ((i, j) in cells) == alive:
+            i += 1
+        yield alive, i - start
+
+def write_rle(f, cells, rule='B3/S23'):
+    """Write cells, anything supporting iteration and membership of (i, j), as RLE.
+    
+    The cells are only walked and tested, never copied or sorted.
+    """
+    i0, j0, i1, j1 = bounding_box(cells)
+    f.write('x = %d, y = %d, rule = %s\n' % (i1 - i0, j1 - j0, rule))
+    line = []
+    width = [0]
+    
+    def emit(token):
+        if width[0] + len(token) > 70:
+            f.write(''.join(line) + '\n')
+            del line[:]
+            width[0] = 0
+        line.append(token)
+        width[0] += len(token)
+    
+    last_j = j0
+    for j in xrange(j0, j1):
+        runs = list(row_runs(cells, j, i0, i1))
+        # trailing dead cells of a row are implied
+        if runs and not runs[-1][0]:
+            runs.pop()
+        if not runs:
+            continue
+        if j > last_j:
+            emit('%d$' % (j - last_j) if j - last_j > 1 else '$')
+        last_j = j
+        for alive, length in runs:
+            emit(('%d' % length if length > 1 else '') + ('o' if alive else 'b'))
+    emit('!')
+    f.write(''.join(line) + '\n')
+
+def write_plaintext(f, cells, name=None):
+    """Write cells as a plaintext (.cells) pattern."""
+    i0, j0, i1, j1 = bounding_box(cells)
+    if name:
+        f.write('!Name: %s\n' % name)
+    for j in xrange(j0, j1):
+        row = ''.join(('O' if alive else '.')*length for alive, length in row_runs(cells, j, i0, i1))
+        f.write(row.rstrip('.') + '\n')
+
+def save_pattern(game, path):
+    """Save the alive cells of a game, the format is chosen by extension."""
+    with open(path, 'w') as f:
+        if os.path.splitext(path)[1].lower() in ('.cells', '.txt'):
+            write_plaintext(f, game.alive_cells, os.path.splitext(os.path.basename(path))[0])
+        else:
+            write_rle(f, game.alive_cells)
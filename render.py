@@ -0,0 +1,25 @@
+import numpy, pygame
+
+class ArrayRenderer(object):
+    """Draw a whole board at once from an array of cell colors.
+    
+    The colors are written to a surface with one pixel per cell, which is
+    scaled up by tile_size onto the screen, so the cost of a frame does not
+    depend on how many cells are alive.
+    """
+    
+    def __init__(self, screen, size, tile_size):
+        self.screen = screen
+        self.size = size
+        self.tile_size = tile_size
+        self.surface = pygame.Surface(size, 0, screen)
+    
+    def draw(self, colors):
+        """Show colors, a (width, height, 3) uint8 array indexed like the board."""
+        pygame.surfarray.blit_array(self.surface, colors)
+        pygame.transform.scale(self.surface, self.screen.get_size(), self.screen)
+        pygame.display.flip()
+
+def palette(*colors):
+    """Return a color lookup table, index it with a board to color every cell at once."""
+    return numpy.array(colors, dtype=numpy.uint8)
@@ -0,0 +1,115 @@
+import sys, time, threading, Queue
+
+# The simulation steps in its own thread and only hands over a copy of the
+# board after each generation. The window renders whatever copy is newest at
+# the display rate, skipping the ones it was too slow to show, so neither a
+# slow generation nor a slow redraw holds up the other or the input handling.
+
+FRAMES_PER_SECOND = 60
+
+class SimulationThread(threading.Thread):
+    """Step a game at a target number of generations per second in the background.
+    
+    Only this thread touches the game once it is started, other threads queue
+    edits with add_cell and read the newest board with latest.
+    """
+    
+    def __init__(self, game, generations_per_second):
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self.game = game
+        self.interval = 1.0/generations_per_second
+        # (i, j) of cells to add, or None for a single step
+        self.edits = Queue.Queue()
+        self.iterate = False
+        self.single_steps = 0
+        self.generation = 0
+        self.lock = threading.Lock()
+        self.frame = None
+        self.version = 0
+    
+    def add_cell(self, i, j):
+        self.edits.put((i, j))
+    
+    def step_once(self):
+        self.edits.put(None)
+    
+    def latest(self, seen=None):
+        """Return (version, board) of the newest state, or None if that version was seen."""
+        with self.lock:
+            if self.frame is None or self.version == seen:
+                return None
+            return self.version, self.frame
+    
+    def publish(self):
+        board = self.game.visible_board().copy()
+        with self.lock:
+            self.frame = board
+            self.version += 1
+    
+    def apply_edits(self, timeout):
+        """Apply the queued edits, waiting up to timeout for the first one."""
+        changed = False
+        try:
+            edit = self.edits.get(timeout=timeout) if timeout > 0 else self.edits.get_nowait()
+            while True:
+                if edit is None:
+                    self.single_steps += 1
+                else:
+                    changed = self.game.add_cell(*edit) or changed
+                edit = self.edits.get_nowait()
+        except Queue.Empty:
+            pass
+        return changed
+    
+    def run(self):
+        self.publish()
+        next_step = time.time()
+        while True:
+            stepping = self.iterate or self.single_steps
+            if self.apply_edits(next_step - time.time() if stepping else 0.1):
+                self.publish()
+            if not (self.iterate or self.single_steps) or time.time() < next_step:
+                continue
+            if self.single_steps:
+                self.single_steps -= 1
+            next_step = max(next_step + self.interval, time.time())
+            # nobody draws the deltas, keep only this generation's
+            self.game.new_alive_cells = []
+            self.game.new_dead_cells = []
+            self.game.step()
+            self.generation += 1
+            self.publish()
+
+def run_threaded(game):
+    """Run a game with the simulation in a SimulationThread and rendering at the display rate."""
+    import pygame
+    from pygame import K_SPACE, K_RIGHT
+    from pygame import QUIT, KEYUP, MOUSEBUTTONDOWN, MOUSEBUTTONUP, MOUSEMOTION
+    simulation = SimulationThread(game, game.updates_per_second)
+    simulation.start()
+    clock = pygame.time.Clock()
+    seen = None
+    add_cell = False
+    while 1:
+        for event in pygame.event.get():
+            if event.type == KEYUP:
+                if event.key == K_SPACE:
+                    simulation.iterate = not simulation.iterate
+                if event.key == K_RIGHT:
+                    simulation.step_once()
+            elif event.type == MOUSEBUTTONDOWN:
+                add_cell = True
+                simulation.add_cell(event.pos[0]//game.tile_size + game.ORIGIN, event.pos[1]//game.tile_size + game.ORIGIN)
+            elif event.type == MOUSEBUTTONUP:
+                add_cell = False
+            elif event.type == MOUSEMOTION:
+                if add_cell:
+                    simulation.add_cell(event.pos[0]//game.tile_size + game.ORIGIN, event.pos[1]//game.tile_size + game.ORIGIN)
+            elif event.type == QUIT:
+                sys.exit()
+        frame = simulation.latest(seen)
+        if frame is not None:
+            seen, board = frame
+            game.renderer.draw(game.palette[board])
+        clock.tick(FRAMES_PER_SECOND)